@@ -1,16 +1,89 @@
+import functools
+import os
 from pathlib import Path
-from typing import Any, Generator, Optional
+from typing import Any, Generator, Optional, Sequence
 from xml.etree import ElementTree as ET
 
 import cv2
 import latex2mathml.converter
+import paddle
 from paddlex import create_model
+from paddlex.inference import PaddlePredictorOption
 from tqdm import tqdm
 
+from constants import SAVE_DEBUG_OUTPUT
 from page_renderer import create_image_from_part_of_page
 from process_bboxes import PaddleXPostProcessingBBoxes
 from process_table import PaddleXPostProcessingTable
 
+# Models that produce wrong results or crash when running with MKL-DNN (oneDNN) on CPU
+MKLDNN_UNSUPPORTED_MODELS: set[str] = {"PP-FormulaNet-L"}
+
+# Models that need full precision on GPU (autoregressive formula decoder loses accuracy in FP16)
+FP16_UNSUPPORTED_MODELS: set[str] = {"PP-FormulaNet-L"}
+
+# Use PaddleX high-performance inference plugin (must be installed in the image), enabled by PADDLE_HPI=1
+USE_HIGH_PERFORMANCE_INFERENCE: bool = os.environ.get("PADDLE_HPI", "0") == "1"
+
+# CPU threads for Paddle Inference, cores available to this process (respects --cpuset-cpus) unless
+# PADDLE_CPU_THREADS is set (e.g. to match docker --cpus limit)
+CPU_THREADS: int = int(os.environ.get("PADDLE_CPU_THREADS", "0")) or len(os.sched_getaffinity(0))
+
+# Maximum number of formula images sent to formula model in one batch
+FORMULA_BATCH_SIZE: int = 8
+
+# Maximum number of table images sent to table models in one batch
+TABLE_BATCH_SIZE: int = 8
+
+
+@functools.cache
+def get_inference_device() -> str:
+    """
+    Detect device for Paddle inference. GPU is used when Paddle is built with CUDA and a GPU is visible.
+
+    Returns:
+        "gpu" or "cpu".
+    """
+    if paddle.device.is_compiled_with_cuda() and paddle.device.cuda.device_count() > 0:
+        return "gpu"
+    return "cpu"
+
+
+def create_paddlex_model(model_name: str, **kwargs: Any) -> Any:
+    """
+    Create PaddleX model from local "models" folder with inference options tuned for the available device.
+
+    On GPU models run in FP16 where supported. On CPU MKL-DNN is enabled for all supported models and
+    Paddle Inference uses CPU_THREADS threads (PaddleX defaults to plain Paddle run mode with 8 threads).
+    With PADDLE_HPI=1 PaddleX high-performance inference chooses the best backend itself.
+
+    Args:
+        model_name (str): Name of PaddleX model (also name of its folder in "models").
+        **kwargs (Any): Additional model arguments passed to PaddleX (e.g. threshold).
+
+    Returns:
+        PaddleX model ready for prediction.
+    """
+    model_dir: str = Path(__file__).parent.parent.joinpath(f"models/{model_name}").resolve().as_posix()
+    device: str = get_inference_device()
+    run_mode: str
+    if device == "gpu":
+        run_mode = "paddle" if model_name in FP16_UNSUPPORTED_MODELS else "paddle_fp16"
+    else:
+        run_mode = "paddle" if model_name in MKLDNN_UNSUPPORTED_MODELS else "mkldnn"
+    predictor_option: PaddlePredictorOption = PaddlePredictorOption(
+        model_name, run_mode=run_mode, cpu_threads=CPU_THREADS
+    )
+
+    return create_model(
+        model_name=model_name,
+        model_dir=model_dir,
+        device=device,
+        pp_option=predictor_option,
+        use_hpip=USE_HIGH_PERFORMANCE_INFERENCE,
+        **kwargs,
+    )
+
 
 class PaddleXEngine:
     """
@@ -37,17 +110,34 @@ class PaddleXEngine:
                 default thresholds will be used.
         """
         self.model_name: str = model
-        model_path: str = Path(__file__).parent.joinpath(f"../models/{model}").resolve().as_posix()
-        self.model_dir: str = model_path
         self.process_formula: bool = process_formula
         self.process_table: bool = process_table
         self.threshold: dict = thresholds
+        # Models are created on first use and reused for all pages, tables and formulas
+        self.models: dict[str, Any] = {}
 
         # Remove thresholds for classes that are not in model
         if model == "RT-DETR-H_layout_17cls":
             for key in range(17, 23):
                 self.threshold.pop(key, None)
 
+    def _get_model(self, model_name: str, **kwargs: Any) -> Any:
+        """
+        Return PaddleX model, create it if it is used for the first time.
+
+        Args:
+            model_name (str): Name of PaddleX model.
+            **kwargs (Any): Additional model arguments used when model is created.
+
+        Returns:
+            PaddleX model ready for prediction.
+        """
+        model: Any = self.models.get(model_name)
+        if model is None:
+            model = create_paddlex_model(model_name, **kwargs)
+            self.models[model_name] = model
+        return model
+
     def process_pdf_page_image_with_ai(
         self,
         image: cv2.typing.MatLike,
@@ -69,21 +159,20 @@ class PaddleXEngine:
         Returns:
             List of recognized elements with data about possition and type.
         """
-        model = create_model(
-            model_name=self.model_name,
-            model_dir=self.model_dir,
-            device="cpu",
-            threshold=self.threshold,
-        )
+        model = self._get_model(self.model_name, threshold=self.threshold)
 
         output: Generator[Any, Any, None] = model.predict(input=image, batch_size=1, layout_nms=True)
 
         for res in output:
-            output_name: str = f"{id}-page{page_number}.png"
-            output_path: str = Path(__file__).parent.joinpath(f"../output/{output_name}").resolve().as_posix()
-            res.save_to_img(save_path=output_path)
+            # Save image with detected layout for debugging
+            if SAVE_DEBUG_OUTPUT:
+                output_name: str = f"{id}-page{page_number}.png"
+                output_path: str = Path(__file__).parent.joinpath(f"../output/{output_name}").resolve().as_posix()
+                res.save_to_img(save_path=output_path)
 
-            table_index: int = 0
+            # Nothing detected on the page, no tables, formulas or post-processing to run
+            if not res.get("boxes"):
+                break
 
             # How many tables and formulas we will process
             number_of_tables: int = len([box for box in res["boxes"] if box["label"] == "table"])
@@ -103,49 +192,60 @@ class PaddleXEngine:
             progress_bar.update(step)
 
             if "boxes" in res:
+                table_boxes: list[dict] = []
+                table_images: list[cv2.typing.MatLike] = []
+                formula_boxes: list[dict] = []
+                formula_images: list[cv2.typing.MatLike] = []
+
                 for box in res["boxes"]:
                     match box["label"]:
                         case "table":
                             if not self.process_table:
                                 continue
 
-                            # Get table image
+                            # Get table image, tables are predicted together after all boxes are visited
                             coordinate: list = box["coordinate"]
-                            table_image: cv2.typing.MatLike = create_image_from_part_of_page(image, coordinate, 1)
-
-                            # Process table
-                            output_file_name: str = f"{id}_{page_number}-table{table_index}.png"
-                            output_file_path: str = (
-                                Path(__file__).parent.joinpath(f"../output/{output_file_name}").resolve().as_posix()
-                            )
-                            table_index += 1
-                            table_dict: dict = self._process_table_image_with_ai_v2(
-                                table_image, coordinate, output_file_path
-                            )
-
-                            # Save as additional data to PaddleX result
-                            box["custom"] = table_dict
-
-                            # Update progress after 1 processed table
-                            progress_bar.update(step)
+                            table_boxes.append(box)
+                            table_images.append(create_image_from_part_of_page(image, coordinate, 1))
 
                         case "formula":
                             if not self.process_formula:
                                 continue
 
-                            # Get formula image
+                            # Get formula image, formulas are predicted together after all boxes are visited
                             coordinate = box["coordinate"]
-                            formula_image: cv2.typing.MatLike = create_image_from_part_of_page(image, coordinate, 1)
-
-                            # Process formula
-                            formula_representation: str = self.process_formula_image_with_ai(formula_image)
-
-                            # Save as additional data to PaddleX result
-                            if formula_representation != "":
-                                box["custom"] = formula_representation
-
-                            # Update progress after 1 processed formula
-                            progress_bar.update(step)
+                            formula_boxes.append(box)
+                            formula_images.append(create_image_from_part_of_page(image, coordinate, 1))
+
+                # Process all tables of the page in batched predictions
+                if table_images:
+                    output_file_paths: list[Optional[str]] = [None] * len(table_images)
+                    if SAVE_DEBUG_OUTPUT:
+                        output_folder: Path = Path(__file__).parent.joinpath("../output").resolve()
+                        output_file_paths = [
+                            output_folder.joinpath(f"{id}_{page_number}-table{table_index}.png").as_posix()
+                            for table_index in range(len(table_images))
+                        ]
+                    table_dicts: list[dict] = self._process_table_images_with_ai(
+                        table_images, [box["coordinate"] for box in table_boxes], output_file_paths
+                    )
+                    for table_box, table_dict in zip(table_boxes, table_dicts):
+                        # Save as additional data to PaddleX result
+                        table_box["custom"] = table_dict
+
+                    # Update progress after all processed tables
+                    progress_bar.update(step * len(table_images))
+
+                # Process all formulas of the page in one prediction
+                if formula_images:
+                    formula_representations: list[str] = self.process_formula_images_with_ai(formula_images)
+                    for formula_box, formula_representation in zip(formula_boxes, formula_representations):
+                        # Save as additional data to PaddleX result
+                        if formula_representation != "":
+                            formula_box["custom"] = formula_representation
+
+                    # Update progress after all processed formulas
+                    progress_bar.update(step * len(formula_images))
 
                 bbox_post_processing: PaddleXPostProcessingBBoxes = PaddleXPostProcessingBBoxes(res)
                 res["boxes"] = bbox_post_processing.process_bboxes()
@@ -164,27 +264,46 @@ class PaddleXEngine:
             image (cv2.typing.MatLike): Rendered image of formula.
 
         Returns:
-            TBE, currently empty dictionary
+            MathML representation of formula or empty string.
+        """
+        return self.process_formula_images_with_ai([image])[0]
+
+    def process_formula_image_path_with_ai(self, image_path: str) -> str:
+        """
+        Let AI do its magic for formula image file. PaddleX reads the file itself.
+
+        Args:
+            image_path (str): Path to image file of formula.
+
+        Returns:
+            MathML representation of formula or empty string.
+        """
+        return self.process_formula_images_with_ai([image_path])[0]
+
+    def process_formula_images_with_ai(self, images: Sequence[cv2.typing.MatLike | str]) -> list[str]:
         """
-        model_name: str = "PP-FormulaNet-L"
-        model_path: str = Path(__file__).parent.joinpath(f"../models/{model_name}").resolve().as_posix()
+        Let AI do its magic for multiple formula images in batched prediction.
 
+        Args:
+            images (Sequence[cv2.typing.MatLike | str]): Rendered images of formulas or paths to image files.
+
+        Returns:
+            MathML representations of formulas in the same order as images, empty string when
+            formula could not be converted to MathML.
+        """
         # Formula model prediction
-        formula_model = create_model(
-            model_name=model_name,
-            model_dir=model_path,
-            device="cpu",
-        )
+        formula_model = self._get_model("PP-FormulaNet-L")
 
-        output: Generator[Any, Any, None] = formula_model.predict(input=image, batch_size=1)
+        output: Generator[Any, Any, None] = formula_model.predict(
+            input=images, batch_size=min(len(images), FORMULA_BATCH_SIZE)
+        )
 
-        for res in output:
-            latex_formula: str = res["rec_formula"]
-            mathml_formula: str = self._convert_to_mathml(latex_formula)
-            return mathml_formula
+        mathml_formulas: list[str] = [self._convert_to_mathml(res["rec_formula"]) for res in output]
 
-        # No formula output
-        return ""
+        # Results are matched to images by position, missing result would shift them to wrong formulas
+        if len(mathml_formulas) != len(images):
+            raise RuntimeError(f"Formula model returned {len(mathml_formulas)} results for {len(images)} images")
+        return mathml_formulas
 
     def _convert_to_mathml(self, latex_formula: str) -> str:
         """
@@ -262,60 +381,54 @@ class PaddleXEngine:
         # Return the modified XML as string
         return ET.tostring(root, encoding="unicode")
 
-    def _process_table_image_with_ai_v2(
-        self, image: cv2.typing.MatLike, coordinate: list, output_file_path: str
-    ) -> dict:
+    def _process_table_images_with_ai(
+        self, images: list[cv2.typing.MatLike], coordinates: list[list], output_file_paths: list[Optional[str]]
+    ) -> list[dict]:
         """
-        Let AI do its magic for table image.
+        Let AI do its magic for all table images of the page in batched predictions.
 
         Args:
-            image (cv2.typing.MatLike): Rendered image of table.
-            coordinate (list): Bounding box of table in rendered PDF page
-            output_file_path (string): Unique absolute file path.
+            images (list[cv2.typing.MatLike]): Rendered images of tables.
+            coordinates (list[list]): Bounding boxes of tables in rendered PDF page.
+            output_file_paths (list[Optional[str]]): Unique absolute file paths for debug images, None to not save it.
 
         Returns:
-            List of recognized cell elements with additional data
+            Recognized cell elements with additional data for each table in the same order as images,
+            empty dictionary for table without classification or cell recognition.
         """
-        model_name: str = "PP-LCNet_x1_0_table_cls"
-        model_path: str = Path(__file__).parent.joinpath(f"../models/{model_name}").resolve().as_posix()
+        table_dicts: list[dict] = [{} for _ in images]
+        batch_size: int = min(len(images), TABLE_BATCH_SIZE)
 
         # Table classification model prediction
-        model = create_model(
-            model_name=model_name,
-            model_dir=model_path,
-            device="cpu",
-        )
+        model = self._get_model("PP-LCNet_x1_0_table_cls")
 
-        output: Generator[Any, Any, None] = model.predict(input=image, batch_size=1)
+        output: Generator[Any, Any, None] = model.predict(input=images, batch_size=batch_size)
+        is_wired_tables: list[bool] = [self._use_wired_model(classification_result) for classification_result in output]
 
-        for classification_result in output:
-            is_wired: bool = self._use_wired_model(classification_result)
+        # Table cells model prediction, one batch for wired and one for wireless tables
+        for is_wired in (True, False):
+            indexes: list[int] = [index for index, wired in enumerate(is_wired_tables) if wired == is_wired]
+            if not indexes:
+                continue
 
-            # Table cells model prediction
             table_cell_model_name: str = (
                 "RT-DETR-L_wired_table_cell_det" if is_wired else "RT-DETR-L_wireless_table_cell_det"
             )
-            table_cell_model_dir: str = (
-                Path(__file__).parent.parent.joinpath(f"models/{table_cell_model_name}").resolve().as_posix()
-            )
+            table_cell_model = self._get_model(table_cell_model_name)
 
-            table_cell_model = create_model(
-                model_name=table_cell_model_name,
-                model_dir=table_cell_model_dir,
-                device="cpu",
-            )
-
-            cell_output = table_cell_model.predict(input=image, batch_size=1)
+            cell_output = table_cell_model.predict(input=[images[index] for index in indexes], batch_size=batch_size)
 
-            for cell_results in cell_output:
-                cell_results.save_to_img(save_path=output_file_path)
+            for index, cell_results in zip(indexes, cell_output):
+                output_file_path: Optional[str] = output_file_paths[index]
+                if output_file_path is not None:
+                    cell_results.save_to_img(save_path=output_file_path)
 
-                # We are processing 1 table so we are expecting just 1 result:
                 post_processing: PaddleXPostProcessingTable = PaddleXPostProcessingTable()
-                return post_processing.create_custom_result_from_paddlex_cell_result(cell_results, coordinate)
+                table_dicts[index] = post_processing.create_custom_result_from_paddlex_cell_result(
+                    cell_results, coordinates[index]
+                )
 
-        # No classification or cell recognition
-        return {}
+        return table_dicts
 
     def _use_wired_model(self, result: dict) -> bool:
         """
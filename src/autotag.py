@@ -1,22 +1,19 @@
+import ctypes
 import json
 from pathlib import Path
 from typing import Optional
 
-import cv2
 from pdfixsdk import (
     GetPdfix,
     PdfDoc,
     PdfDocTemplate,
     Pdfix,
-    PdfPage,
-    PdfPageView,
     PdfTagsParams,
     PdsObject,
     PdsStructElement,
     PdsStructTree,
     PsMemoryStream,
     kDataFormatJson,
-    kRotate0,
     kSaveFull,
 )
 from tqdm import tqdm
@@ -24,13 +21,11 @@ from tqdm import tqdm
 from ai import PaddleXEngine
 from constants import (
     MATH_ML_VERSION,
-    PERCENT_AI,
-    PERCENT_RENDER,
-    PERCENT_TEMPLATE,
     PROGRESS_FIRST_STEP,
     PROGRESS_FOURTH_STEP,
     PROGRESS_SECOND_STEP,
     PROGRESS_THIRD_STEP,
+    SAVE_DEBUG_OUTPUT,
 )
 from exceptions import (
     PdfixFailedToOpenException,
@@ -39,9 +34,14 @@ from exceptions import (
     PdfixInitializeException,
     PdfixNoTagsException,
 )
-from page_renderer import create_image_from_pdf_page
+from page_pipeline import PdfPagesPipeline
 from template_json import TemplateJsonCreator
-from utils_sdk import authorize_sdk, browse_tags_recursive, json_to_raw_data, set_associated_file_math_ml
+from utils_sdk import (
+    authorize_sdk,
+    browse_tags_recursive,
+    bytearray_to_data,
+    set_associated_file_math_ml,
+)
 
 
 class AutotagUsingPaddleXRecognition:
@@ -109,125 +109,69 @@ class AutotagUsingPaddleXRecognition:
             if doc is None:
                 raise PdfixFailedToOpenException(pdfix, self.input_path_str)
 
-            # Process images of each page
-            number_of_pages: int = doc.GetNumPages()
-            paddlex: PaddleXEngine = PaddleXEngine(
-                self.model, self.process_formula, self.process_table, self.thresholds
-            )
-            template_json_creator: TemplateJsonCreator = TemplateJsonCreator()
-
-            progress_bar.update(PROGRESS_FIRST_STEP)
-            progress_bar.set_description("Processing pages")
-            step_count: float = float(PROGRESS_SECOND_STEP) / number_of_pages
-
-            for page_index in range(0, number_of_pages):
-                # Acquire the page
-                page: Optional[PdfPage] = doc.AcquirePage(page_index)
-                if page is None:
-                    raise PdfixFailedToTagException(pdfix, "Unable to acquire the page")
-
-                try:
-                    # Process the page
-                    self._process_pdf_file_page(
-                        pdfix, id, page, page_index, paddlex, template_json_creator, progress_bar, step_count
-                    )
-                except Exception:
-                    raise
-                finally:
-                    # Clean-up
-                    page.Release()
-
-            progress_bar.n = PROGRESS_FIRST_STEP + PROGRESS_SECOND_STEP
-            progress_bar.set_description("Saving template")
-            progress_bar.refresh()
-
-            # Create template for whole document
-            template_json_dict: dict = template_json_creator.create_json_dict_for_document(self.model, self.zoom)
-
-            # Save template to file
-            template_path: Path = Path(__file__).parent.joinpath(f"../output/{id}-template_json.json").resolve()
-            with open(template_path, "w") as file:
-                file.write(json.dumps(template_json_dict, indent=2))
-
-            progress_bar.n = PROGRESS_FIRST_STEP + PROGRESS_SECOND_STEP + PROGRESS_THIRD_STEP
-            progress_bar.set_description("Autotagging document")
-            progress_bar.refresh()
-
-            # Autotag document
-            self._autotag_using_template(doc, template_json_dict, pdfix)
-
-            # Add Associate File (AF) for formulas to document
-            if self.process_formula:
-                formulas: list[tuple[int, str]] = template_json_creator.get_formulas()
-                self._add_afs_for_formulas(pdfix, doc, formulas)
-
-            # Save document
-            if not doc.Save(self.output_path_str, kSaveFull):
-                raise PdfixFailedToSaveException(pdfix, self.output_path_str)
-
-            progress_bar.n = total_progress_count
-            progress_bar.set_description("Done")
-            progress_bar.refresh()
-
-    def _process_pdf_file_page(
-        self,
-        pdfix: Pdfix,
-        id: str,
-        page: PdfPage,
-        page_index: int,
-        paddlex: PaddleXEngine,
-        templateJsonCreator: TemplateJsonCreator,
-        progress_bar: tqdm,
-        total_units_for_page_processing: float,
-    ) -> None:
-        """
-        Create template json for current PDF document page.
-
-        Args:
-            pdfix (Pdfix): Pdfix SDK.
-            id (string): PDF document name.
-            page (PdfPage): The PDF document page to process.
-            page_index (int): PDF file page index.
-            paddlex (PaddleXEngine): PaddleX engine instance for processing.
-            templateJsonCreator (TemplateJsonCreator): Template JSON creator.
-            progress_bar (tqdm): Progress bar.
-            total_units_for_page_processing (float): How many units progress bar needs to update.
-        """
-        page_number: int = page_index + 1
-
-        render_step_units: float = total_units_for_page_processing * PERCENT_RENDER
-        ai_step_units: float = total_units_for_page_processing * PERCENT_AI
-        template_step_units: float = total_units_for_page_processing * PERCENT_TEMPLATE
-
-        # Define zoom level and rotation for rendering the page
-        page_view: Optional[PdfPageView] = page.AcquirePageView(self.zoom, kRotate0)
-        if page_view is None:
-            raise PdfixFailedToTagException(pdfix, "Unable to acquire page view")
-
-        try:
-            # Render the page as an image
-            image: cv2.typing.MatLike = create_image_from_pdf_page(pdfix, page, page_view)
-            progress_bar.update(render_step_units)
-
-            # Run layout model analysis and formula and table model analysis using the PaddleX engine
-            results: dict = paddlex.process_pdf_page_image_with_ai(image, id, page_number, progress_bar, ai_step_units)
-
-            # Create template json from PaddleX results for this page
-            templateJsonCreator.process_page(results, page_number, page_view, self.zoom)
-            progress_bar.update(template_step_units)
-        except Exception:
-            raise
-        finally:
-            # Release resources
-            page_view.Release()
-
-    def _autotag_using_template(self, doc: PdfDoc, template_json_dict: dict, pdfix: Pdfix) -> None:
+            try:
+                # Process images of each page
+                number_of_pages: int = doc.GetNumPages()
+                paddlex: PaddleXEngine = PaddleXEngine(
+                    self.model, self.process_formula, self.process_table, self.thresholds
+                )
+                template_json_creator: TemplateJsonCreator = TemplateJsonCreator()
+
+                progress_bar.update(PROGRESS_FIRST_STEP)
+                progress_bar.set_description("Processing pages")
+                step_count: float = float(PROGRESS_SECOND_STEP) / number_of_pages
+
+                pipeline: PdfPagesPipeline = PdfPagesPipeline(
+                    pdfix, self.zoom, paddlex, template_json_creator, PdfixFailedToTagException
+                )
+                pipeline.process_pages(doc, id, progress_bar, step_count)
+
+                progress_bar.n = PROGRESS_FIRST_STEP + PROGRESS_SECOND_STEP
+                progress_bar.set_description("Saving template")
+                progress_bar.refresh()
+
+                # Create template for whole document
+                template_json_dict: dict = template_json_creator.create_json_dict_for_document(self.model, self.zoom)
+
+                # Serialize template in compact form for the memory stream
+                template_json_data: bytes = json.dumps(template_json_dict, separators=(",", ":")).encode("utf-8")
+
+                # Save readable template to file for debugging
+                if SAVE_DEBUG_OUTPUT:
+                    template_path: Path = Path(__file__).parent.joinpath(f"../output/{id}-template_json.json").resolve()
+                    with open(template_path, "w", encoding="utf-8") as file:
+                        json.dump(template_json_dict, file, indent=2)
+
+                progress_bar.n = PROGRESS_FIRST_STEP + PROGRESS_SECOND_STEP + PROGRESS_THIRD_STEP
+                progress_bar.set_description("Autotagging document")
+                progress_bar.refresh()
+
+                # Autotag document
+                self._autotag_using_template(doc, template_json_data, pdfix)
+
+                # Add Associate File (AF) for formulas to document
+                if self.process_formula:
+                    formulas: list[tuple[int, str]] = template_json_creator.get_formulas()
+                    self._add_afs_for_formulas(pdfix, doc, formulas)
+
+                # Save document
+                if not doc.Save(self.output_path_str, kSaveFull):
+                    raise PdfixFailedToSaveException(pdfix, self.output_path_str)
+
+                progress_bar.n = total_progress_count
+                progress_bar.set_description("Done")
+                progress_bar.refresh()
+            finally:
+                # Clean-up
+                doc.Close()
+
+    def _autotag_using_template(self, doc: PdfDoc, template_json_data: bytes, pdfix: Pdfix) -> None:
         """
         Autotag opened document using template and remove previous tags and structures.
 
         Args:
             doc (PdfDoc): Opened document to tag.
-            template_json_dict (dict): Template for tagging.
+            template_json_data (bytes): Serialized JSON template for tagging.
             pdfix (Pdfix): Pdfix SDK.
         """
         # Remove old structure and prepare an empty structure tree
@@ -242,15 +186,13 @@ class AutotagUsingPaddleXRecognition:
             raise PdfixFailedToTagException(pdfix, "Unable to create memory stream")
 
         try:
-            raw_data, raw_data_size = json_to_raw_data(template_json_dict)
-            if not memory_stream.Write(0, raw_data, raw_data_size):
+            raw_data: ctypes.Array[ctypes.c_ubyte] = bytearray_to_data(bytearray(template_json_data))
+            if not memory_stream.Write(0, raw_data, len(raw_data)):
                 raise PdfixFailedToTagException(pdfix, "Unable to write template data into memory")
 
             doc_template: Optional[PdfDocTemplate] = doc.GetTemplate()
             if doc_template is None or not doc_template.LoadFromStream(memory_stream, kDataFormatJson):
                 raise PdfixFailedToTagException(pdfix, "Unable to save template into document")
-        except Exception:
-            raise
         finally:
             memory_stream.Destroy()
 
@@ -280,6 +222,9 @@ class AutotagUsingPaddleXRecognition:
         if struct_tree is None:
             raise PdfixNoTagsException(pdfix, "PDF has no elements in structure tree")
 
+        # Index formulas by "id" so each lookup is constant time
+        formula_by_id: dict[str, tuple[int, str]] = {str(data[0]): data for data in formulas}
+
         items: list[PdsStructElement] = browse_tags_recursive(child_element, "Formula")
         for formula_element in items:
             element_id: str = formula_element.GetId()
@@ -287,9 +232,8 @@ class AutotagUsingPaddleXRecognition:
                 # This formula element does not have "id"
                 continue
 
-            index: int = next((i for i, data in enumerate(formulas) if str(data[0]) == element_id), -1)
-            if index < 0:
+            formula: Optional[tuple[int, str]] = formula_by_id.pop(element_id, None)
+            if formula is None:
                 # We don't have data for this formula "id"
                 continue
-            formula: tuple[int, str] = formulas.pop(index)
             set_associated_file_math_ml(pdfix, formula_element, formula[1], MATH_ML_VERSION)
@@ -1,4 +1,8 @@
+import os
+from pathlib import Path
+
 CONFIG_FILE: str = "config.json"
+CONFIG_PATH: Path = Path(__file__).resolve().parent.parent.joinpath(CONFIG_FILE)  # config.json next to "src" folder
 DOCKER_NAMESPACE: str = "pdfix"
 DOCKER_REPOSITORY: str = "pdf-accessibility-paddle"
 DOCKER_IMAGE: str = f"{DOCKER_NAMESPACE}/{DOCKER_REPOSITORY}"
@@ -11,4 +15,5 @@ PROGRESS_FIRST_STEP: int = 10  # Initialize (open document, read page count, etc
 PROGRESS_FOURTH_STEP: int = 80  # Autotagging and saving document/data
 PROGRESS_SECOND_STEP: int = 900  # Run AI heavy workload (+ rendering + template conversion)
 PROGRESS_THIRD_STEP: int = 10  # Save template or prepare it for autotagging
+SAVE_DEBUG_OUTPUT: bool = os.environ.get("SAVE_DEBUG_OUTPUT", "0") == "1"  # Save images and template to "output"
 SUPPORTED_IMAGE_EXT: str = ".jpg .jpeg .png .bmp"
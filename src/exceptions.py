@@ -79,10 +79,8 @@ class PdfixException(ExpectedException):
         super().__init__(error_code)
         pdfix_error_code: int = pdfix.GetErrorType()
         pdfix_error: str = str(pdfix.GetError())
-        self.add_note(
-            f"[{pdfix_error_code}] [{pdfix_error}]: {message}"
-            if len(message) > 0
-            else f"[{pdfix_error_code}] {pdfix_error}"
+        self._add_note(
+            f"[{pdfix_error_code}] [{pdfix_error}]: {message}" if message else f"[{pdfix_error_code}] {pdfix_error}"
         )
 
 
@@ -1,3 +1,5 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
 
 import cv2
@@ -5,6 +7,7 @@ from pdfixsdk import (
     GetPdfix,
     PdfDoc,
     Pdfix,
+    PdfMatrix,
     PdfRect,
     PdsObject,
     PdsStructElement,
@@ -13,7 +16,7 @@ from pdfixsdk import (
 )
 from tqdm import tqdm
 
-from ai import PaddleXEngine
+from ai import FORMULA_BATCH_SIZE, PaddleXEngine
 from constants import (
     MATH_ML_VERSION,
     PERCENT_AI,
@@ -30,7 +33,7 @@ from exceptions import (
     PdfixInitializeException,
     PdfixNoTagsException,
 )
-from page_renderer import render_element_to_image
+from page_renderer import create_image_from_rect_of_page, render_page_to_image
 from utils_sdk import authorize_sdk, browse_tags_recursive, set_associated_file_math_ml
 
 
@@ -57,18 +60,15 @@ class GenerateMathmlFromImage:
         is saved to XML  output file.
 
         The function performs the following steps:
-        1. Reads the input image file.
-        2. Passes the image to paddle engine (that uses formula model)
-        3. Converts response to MathML ver. 3
-        4. Saves the MathMl in the output XML file.
+        1. Passes the input image file to paddle engine (that uses formula model and reads the file)
+        2. Converts response to MathML ver. 3
+        3. Saves the MathMl in the output XML file.
         """
         with tqdm(total=100) as progress_bar:
             progress_bar.set_description("Processing")
 
-            image: cv2.typing.MatLike = cv2.imread(self.input_path_str)
-
             ai: PaddleXEngine = PaddleXEngine()
-            mathml_formula: str = ai.process_formula_image_with_ai(image)
+            mathml_formula: str = ai.process_formula_image_path_with_ai(self.input_path_str)
 
             with open(self.output_path_str, "w", encoding="utf-8") as output_file:
                 output_file.write(mathml_formula)
@@ -127,72 +127,141 @@ class GenerateMathmlInPdf:
             if doc is None:
                 raise PdfixFailedToOpenException(pdfix, self.input_path_str)
 
-            ai: PaddleXEngine = PaddleXEngine()
-
-            # Get Root Tag element
-            struct_tree: Optional[PdsStructTree] = doc.GetStructTree()
-            if struct_tree is None:
-                raise PdfixNoTagsException(pdfix, "PDF has no structure tree")
-
-            child_object: Optional[PdsObject] = struct_tree.GetChildObject(0)
-            if child_object is None:
-                raise PdfixNoTagsException(pdfix, "PDF has no child objects in structure tree")
-            child_element: Optional[PdsStructElement] = struct_tree.GetStructElementFromObject(child_object)
-            if child_element is None:
-                raise PdfixNoTagsException(pdfix, "PDF has no elements in structure tree")
-
-            # Find all formulas:
-            items: list[PdsStructElement] = browse_tags_recursive(child_element, "Formula")
-            count: int = len(items)
-
-            # Process elements only if there is any element for processing
-            if count > 0:
-                progress_bar.update(PROGRESS_FIRST_STEP)
-                progress_bar.set_description("Processing elements")
-                step_count: float = float(PROGRESS_SECOND_STEP + PROGRESS_THIRD_STEP) / count
-
-                for index in tqdm(range(count)):
-                    element: PdsStructElement = items[index]
-                    self._process_element(pdfix, doc, element, ai, progress_bar, step_count)
-
-            progress_bar.n = PROGRESS_FIRST_STEP + PROGRESS_SECOND_STEP + PROGRESS_THIRD_STEP
-            progress_bar.set_description("Saving document")
-            progress_bar.refresh()
-
-            # Save document
-            if not doc.Save(self.output_path_str, kSaveFull):
-                raise PdfixFailedToSaveException(pdfix, self.output_path_str)
-
-            progress_bar.n = total_progress_count
-            progress_bar.set_description("Done")
-            progress_bar.refresh()
-
-    def _process_element(
+            try:
+                ai: PaddleXEngine = PaddleXEngine()
+
+                # Get Root Tag element
+                struct_tree: Optional[PdsStructTree] = doc.GetStructTree()
+                if struct_tree is None:
+                    raise PdfixNoTagsException(pdfix, "PDF has no structure tree")
+
+                child_object: Optional[PdsObject] = struct_tree.GetChildObject(0)
+                if child_object is None:
+                    raise PdfixNoTagsException(pdfix, "PDF has no child objects in structure tree")
+                child_element: Optional[PdsStructElement] = struct_tree.GetStructElementFromObject(child_object)
+                if child_element is None:
+                    raise PdfixNoTagsException(pdfix, "PDF has no elements in structure tree")
+
+                # Find all formulas:
+                items: list[PdsStructElement] = browse_tags_recursive(child_element, "Formula")
+                count: int = len(items)
+
+                # Process elements only if there is any element for processing
+                if count > 0:
+                    progress_bar.update(PROGRESS_FIRST_STEP)
+                    progress_bar.set_description("Processing elements")
+                    step_count: float = float(PROGRESS_SECOND_STEP + PROGRESS_THIRD_STEP) / count
+
+                    self._process_elements(pdfix, doc, items, ai, progress_bar, step_count)
+
+                progress_bar.n = PROGRESS_FIRST_STEP + PROGRESS_SECOND_STEP + PROGRESS_THIRD_STEP
+                progress_bar.set_description("Saving document")
+                progress_bar.refresh()
+
+                # Save document
+                if not doc.Save(self.output_path_str, kSaveFull):
+                    raise PdfixFailedToSaveException(pdfix, self.output_path_str)
+
+                progress_bar.n = total_progress_count
+                progress_bar.set_description("Done")
+                progress_bar.refresh()
+            finally:
+                # Clean-up
+                doc.Close()
+
+    def _process_elements(
         self,
         pdfix: Pdfix,
         doc: PdfDoc,
-        element: PdsStructElement,
+        elements: list[PdsStructElement],
         ai: PaddleXEngine,
         progress_bar: tqdm,
         total_units_for_element_processing: float,
     ) -> None:
         """
-        For given element, tries to get page number and bounding box. If successfull creates image of element and
-        sents it to Paddle Formula Model and transforms answer to MathMl ver.3. Then sets it to element as associate
-        file (AF).
+        Renders formula elements and lets Paddle Formula Model recognize them in batches in worker thread while the
+        next batch is rendered. PDFix calls stay on the calling thread. MathML is set as associate file (AF) to elements
+        in document order.
 
         Args:
             pdfix (Pdfix): Pdfix SDK.
             doc (PdfDoc): PDF document.
-            element (PdsStructElement): Formula element.
+            elements (list[PdsStructElement]): Formula elements.
             ai (PaddleXEngine): Contains ai models and how to run them.
             progress_bar (tqdm): Progress bar.
-            total_units_for_element_processing (float): How many units progress bar needs to update.
+            total_units_for_element_processing (float): How many units progress bar needs to update for one element.
         """
         render_step_units: float = total_units_for_element_processing * PERCENT_RENDER
         ai_step_units: float = total_units_for_element_processing * PERCENT_AI
         template_step_units: float = total_units_for_element_processing * PERCENT_TEMPLATE
 
+        batches_in_progress: deque[tuple[list[PdsStructElement], Future[list[str]]]] = deque()
+        with ThreadPoolExecutor(max_workers=1) as ai_executor:
+            try:
+                # Page of last rendered element, formulas are mostly in page order so each page is rendered once
+                page_images: dict[int, tuple[cv2.typing.MatLike, PdfMatrix]] = {}
+                batch_elements: list[PdsStructElement] = []
+                batch_images: list[cv2.typing.MatLike] = []
+                for element in tqdm(elements):
+                    # Create image
+                    image: Optional[cv2.typing.MatLike] = self._render_element(pdfix, doc, element, page_images)
+                    if image is None:
+                        progress_bar.update(total_units_for_element_processing)
+                        continue
+                    progress_bar.update(render_step_units)
+                    batch_elements.append(element)
+                    batch_images.append(image)
+
+                    if len(batch_images) < FORMULA_BATCH_SIZE:
+                        continue
+
+                    # Recognize formulas of full batch in one prediction
+                    future: Future[list[str]] = ai_executor.submit(ai.process_formula_images_with_ai, batch_images)
+                    batches_in_progress.append((batch_elements, future))
+                    batch_elements, batch_images = [], []
+
+                    # Previous batch finishes while this one is recognized
+                    if len(batches_in_progress) > 1:
+                        self._finish_batch(
+                            pdfix, batches_in_progress.popleft(), progress_bar, ai_step_units, template_step_units
+                        )
+
+                # Recognize formulas of last incomplete batch
+                if batch_images:
+                    batches_in_progress.append(
+                        (batch_elements, ai_executor.submit(ai.process_formula_images_with_ai, batch_images))
+                    )
+
+                while batches_in_progress:
+                    self._finish_batch(
+                        pdfix, batches_in_progress.popleft(), progress_bar, ai_step_units, template_step_units
+                    )
+            finally:
+                # Do not start recognition of formulas left over after failure
+                for _, future in batches_in_progress:
+                    future.cancel()
+
+    def _render_element(
+        self,
+        pdfix: Pdfix,
+        doc: PdfDoc,
+        element: PdsStructElement,
+        page_images: dict[int, tuple[cv2.typing.MatLike, PdfMatrix]],
+    ) -> Optional[cv2.typing.MatLike]:
+        """
+        For given element, tries to get page number and bounding box. If successfull cuts image of element
+        from rendered page.
+
+        Args:
+            pdfix (Pdfix): Pdfix SDK.
+            doc (PdfDoc): PDF document.
+            element (PdsStructElement): Formula element.
+            page_images (dict[int, tuple[cv2.typing.MatLike, PdfMatrix]]): Rendered page images and their device
+                matrices by page number, page of this element replaces them when it is not there.
+
+        Returns:
+            Rendered image of element or None when element is skipped.
+        """
         # For logging purposes
         element_object_id: int = element.GetObject().GetId()
         element_id: str = element.GetId()
@@ -200,36 +269,64 @@ class GenerateMathmlInPdf:
         log_id: str = f"{element_type} [obj: {element_object_id}, id: {element_id}]"
 
         # Get page number
-        page_number: int = element.GetPageNumber(0)
-        if page_number == -1:
+        page_num: int = element.GetPageNumber(0)
+        if page_num == -1:
             for i in range(0, element.GetNumChildren()):
-                page_number = element.GetChildPageNumber(i)
-                if page_number != -1:
+                page_num = element.GetChildPageNumber(i)
+                if page_num != -1:
                     break
 
-        if page_number == -1:
+        if page_num == -1:
             print(f"Skipping [{log_id}] Formula tag as we can't determine the page number")
-            return
+            return None
 
-        # Get bounding box
-        bbox: PdfRect = PdfRect()
-        for i in range(element.GetNumPages()):
-            page_num: int = element.GetPageNumber(i)
-            bbox = element.GetBBox(page_num)
-            break
+        # Get bounding box on that page
+        bbox: PdfRect = element.GetBBox(page_num)
 
         if bbox.left == bbox.right or bbox.top == bbox.bottom:
             print(f"Skipping [{log_id}] Formula tag as we can't determine the bounding box")
-            return
+            return None
+
+        # Render the page only for first element on it
+        page_image: Optional[tuple[cv2.typing.MatLike, PdfMatrix]] = page_images.get(page_num)
+        if page_image is None:
+            page_image = render_page_to_image(pdfix, doc, page_num, 1)
+            page_images.clear()
+            page_images[page_num] = page_image
 
         # Create image
-        image: cv2.typing.MatLike = render_element_to_image(pdfix, doc, page_num, bbox, 1)
-        progress_bar.update(render_step_units)
+        image: cv2.typing.MatLike = create_image_from_rect_of_page(page_image[0], page_image[1], bbox)
+        if image.size == 0:
+            print(f"Skipping [{log_id}] Formula tag as its bounding box is outside of the page")
+            return None
+
+        return image
+
+    def _finish_batch(
+        self,
+        pdfix: Pdfix,
+        batch_in_progress: tuple[list[PdsStructElement], Future[list[str]]],
+        progress_bar: tqdm,
+        ai_step_units: float,
+        template_step_units: float,
+    ) -> None:
+        """
+        Waits for recognized formulas of batch and sets MathMl ver.3 to each element as associate file (AF).
+
+        Args:
+            pdfix (Pdfix): Pdfix SDK.
+            batch_in_progress (tuple[list[PdsStructElement], Future[list[str]]]): Formula elements and pending
+                MathMLs in the same order.
+            progress_bar (tqdm): Progress bar.
+            ai_step_units (float): How many units progress bar needs to update after recognition of one element.
+            template_step_units (float): How many units progress bar needs to update after setting one AF.
+        """
+        elements, future = batch_in_progress
 
-        # Recognize formula
-        mathml_formula: str = ai.process_formula_image_with_ai(image)
-        progress_bar.update(ai_step_units)
+        mathml_formulas: list[str] = future.result()
+        progress_bar.update(ai_step_units * len(elements))
 
         # Set AF
-        set_associated_file_math_ml(pdfix, element, mathml_formula, MATH_ML_VERSION)
-        progress_bar.update(template_step_units)
+        for element, mathml_formula in zip(elements, mathml_formulas):
+            set_associated_file_math_ml(pdfix, element, mathml_formula, MATH_ML_VERSION)
+            progress_bar.update(template_step_units)
@@ -2,12 +2,11 @@ import json
 import os
 import sys
 from datetime import datetime
-from pathlib import Path
 from typing import Any, Optional
 
 import requests
 
-from constants import CONFIG_FILE, DOCKER_IMAGE, DOCKER_NAMESPACE, DOCKER_REPOSITORY
+from constants import CONFIG_FILE, CONFIG_PATH, DOCKER_IMAGE, DOCKER_NAMESPACE, DOCKER_REPOSITORY
 
 
 class DockerImageContainerUpdateChecker:
@@ -46,9 +45,8 @@ class DockerImageContainerUpdateChecker:
         Returns:
             The current version of the Docker image.
         """
-        config_path: Path = Path(__file__).parent.parent.joinpath(CONFIG_FILE).resolve()
         try:
-            with open(config_path, "r", encoding="utf-8") as f:
+            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
                 config: Any = json.load(f)
                 return config.get("version", "unknown")
         except (FileNotFoundError, json.JSONDecodeError) as e:
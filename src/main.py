@@ -1,14 +1,13 @@
 import argparse
+import os
 import re
+import shutil
 import sys
 import threading
 import traceback
-from pathlib import Path
 from typing import Any, Optional
 
-from autotag import AutotagUsingPaddleXRecognition
-from constants import CONFIG_FILE, IMAGE_FILE_EXT_REGEX, SUPPORTED_IMAGE_EXT
-from create_template import CreateTemplateJsonUsingPaddleXRecognition
+from constants import CONFIG_PATH, IMAGE_FILE_EXT_REGEX, SUPPORTED_IMAGE_EXT
 from exceptions import (
     EC_ARG_GENERAL,
     MESSAGE_ARG_GENERAL,
@@ -18,8 +17,42 @@ from exceptions import (
     ArgumentZoomException,
     ExpectedException,
 )
-from generate_mathml import GenerateMathmlFromImage, GenerateMathmlInPdf
-from image_update import DockerImageContainerUpdateChecker
+
+# Set SKIP_UPDATE_CHECK=1 to never check Docker Hub for newer image
+SKIP_UPDATE_CHECK: bool = os.environ.get("SKIP_UPDATE_CHECK", "0") == "1"
+
+# How long to wait for update check after subcommand finished, in seconds
+UPDATE_CHECK_TIMEOUT: float = 0.5
+
+# Input image files supported by mathml subcommand
+IMAGE_FILE_EXT_PATTERN: re.Pattern[str] = re.compile(IMAGE_FILE_EXT_REGEX, re.IGNORECASE)
+
+# Threshold arguments with their default values ordered by layout class id of the model, position is the class id
+THRESHOLD_ARGUMENTS: dict[str, float] = {
+    "threshold_paragraph_title": 0.3,
+    "threshold_image": 0.5,
+    "threshold_text": 0.5,
+    "threshold_number": 0.5,
+    "threshold_abstract": 0.5,
+    "threshold_content": 0.5,
+    "threshold_figure_title": 0.5,
+    "threshold_formula": 0.3,
+    "threshold_table": 0.5,
+    "threshold_table_title": 0.5,
+    "threshold_reference": 0.5,
+    "threshold_doc_title": 0.5,
+    "threshold_footnote": 0.5,
+    "threshold_header": 0.3,
+    "threshold_algorithm": 0.5,
+    "threshold_footer": 0.5,
+    "threshold_seal": 0.3,
+    "threshold_chart_title": 0.5,
+    "threshold_chart": 0.5,
+    "threshold_formula_number": 0.5,
+    "threshold_header_image": 0.3,
+    "threshold_footer_image": 0.5,
+    "threshold_aside_text": 0.5,
+}
 
 
 def str2bool(value: Any) -> bool:
@@ -108,166 +141,14 @@ def set_arguments(
                     default=True,
                     help="Process tables in the PDF document using table models. Default is True.",
                 )
-            case "threshold_paragraph_title":  # "0"
-                parser.add_argument(
-                    "--threshold_paragraph_title",
-                    type=float,
-                    default=0.3,
-                    help="Threshold for paragraph title. Value between 0.0 and 1.0. Default is 0.3.",
-                )
-            case "threshold_image":  # "1"
-                parser.add_argument(
-                    "--threshold_image",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for image. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_text":  # "2"
-                parser.add_argument(
-                    "--threshold_text",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for text. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_number":  # "3"
-                parser.add_argument(
-                    "--threshold_number",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for number. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_abstract":  # "4"
-                parser.add_argument(
-                    "--threshold_abstract",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for abstract. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_content":  # "5"
-                parser.add_argument(
-                    "--threshold_content",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for content. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_figure_title":  # "6"
-                parser.add_argument(
-                    "--threshold_figure_title",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for figure title. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_formula":  # "7"
-                parser.add_argument(
-                    "--threshold_formula",
-                    type=float,
-                    default=0.3,
-                    help="Threshold for formula. Value between 0.0 and 1.0. Default is 0.3.",
-                )
-            case "threshold_table":  # "8"
-                parser.add_argument(
-                    "--threshold_table",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for table. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_table_title":  # "9"
-                parser.add_argument(
-                    "--threshold_table_title",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for table title. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_reference":  # "10"
-                parser.add_argument(
-                    "--threshold_reference",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for reference. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_doc_title":  # "11"
-                parser.add_argument(
-                    "--threshold_doc_title",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for doc title. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_footnote":  # "12"
-                parser.add_argument(
-                    "--threshold_footnote",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for footnote. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_header":  # "13"
-                parser.add_argument(
-                    "--threshold_header",
-                    type=float,
-                    default=0.3,
-                    help="Threshold for header. Value between 0.0 and 1.0. Default is 0.3.",
-                )
-            case "threshold_algorithm":  # "14"
-                parser.add_argument(
-                    "--threshold_algorithm",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for algorithm. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_footer":  # "15"
-                parser.add_argument(
-                    "--threshold_footer",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for footer. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_seal":  # "16"
-                parser.add_argument(
-                    "--threshold_seal",
-                    type=float,
-                    default=0.3,
-                    help="Threshold for seal. Value between 0.0 and 1.0. Default is 0.3.",
-                )
-            case "threshold_chart_title":  # "17"
-                parser.add_argument(
-                    "--threshold_chart_title",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for chart title. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_chart":  # "18"
-                parser.add_argument(
-                    "--threshold_chart",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for chart. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_formula_number":  # "19"
-                parser.add_argument(
-                    "--threshold_formula_number",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for formula number. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_header_image":  # "20"
-                parser.add_argument(
-                    "--threshold_header_image",
-                    type=float,
-                    default=0.3,
-                    help="Threshold for header image. Value between 0.0 and 1.0. Default is 0.3.",
-                )
-            case "threshold_footer_image":  # "21"
-                parser.add_argument(
-                    "--threshold_footer_image",
-                    type=float,
-                    default=0.5,
-                    help="Threshold for footer image. Value between 0.0 and 1.0. Default is 0.5.",
-                )
-            case "threshold_aside_text":  # "22"
+            case _ if name in THRESHOLD_ARGUMENTS:
+                default: float = THRESHOLD_ARGUMENTS[name]
+                label: str = name.removeprefix("threshold_").replace("_", " ")
                 parser.add_argument(
-                    "--threshold_aside_text",
+                    f"--{name}",
                     type=float,
-                    default=0.5,
-                    help="Threshold for aside text. Value between 0.0 and 1.0. Default is 0.5.",
+                    default=default,
+                    help=f"Threshold for {label}. Value between 0.0 and 1.0. Default is {default}.",
                 )
             case "zoom":
                 parser.add_argument(
@@ -287,13 +168,13 @@ def get_pdfix_config(path: str) -> None:
     Args:
         path (str): Destination path for config.json file
     """
-    config_path: Path = Path(__file__).parent.parent.joinpath(CONFIG_FILE).resolve()
-    with open(config_path, "r", encoding="utf-8") as file:
-        if path is None:
-            print(file.read())
-        else:
-            with open(path, "w") as out:
-                out.write(file.read())
+    if path is None:
+        # Pass UTF-8 bytes to stdout as they are, ending with new line like print
+        sys.stdout.flush()
+        sys.stdout.buffer.write(CONFIG_PATH.read_bytes() + b"\n")
+        sys.stdout.buffer.flush()
+    else:
+        shutil.copyfile(CONFIG_PATH, path)
 
 
 def run_autotag_subcommand(args) -> None:
@@ -340,6 +221,9 @@ def autotagging_pdf(
         raise ArgumentZoomException()
 
     if input_path.lower().endswith(".pdf") and output_path.lower().endswith(".pdf"):
+        # Import Paddle, PaddleX and OpenCV only when they are needed
+        from autotag import AutotagUsingPaddleXRecognition
+
         autotag = AutotagUsingPaddleXRecognition(
             license_name, license_key, input_path, output_path, model, zoom, process_formula, process_table, thresholds
         )
@@ -382,6 +266,9 @@ def create_template_json(
         raise ArgumentZoomException()
 
     if input_path.lower().endswith(".pdf") and output_path.lower().endswith(".json"):
+        # Import Paddle, PaddleX and OpenCV only when they are needed
+        from create_template import CreateTemplateJsonUsingPaddleXRecognition
+
         template_creator = CreateTemplateJsonUsingPaddleXRecognition(
             license_name, license_key, input_path, output_path, model, zoom, process_table, thresholds
         )
@@ -406,10 +293,18 @@ def formula_to_mathml(
         input_path (str): Path to PDF document.
         output_path (str): Path to PDF document.
     """
-    if input_path.lower().endswith(".pdf") and output_path.lower().endswith(".pdf"):
+    # Output extension decides the mode for both input types, lowercase it once
+    output_path_lower: str = output_path.lower()
+
+    if input_path.lower().endswith(".pdf") and output_path_lower.endswith(".pdf"):
+        # Import Paddle, PaddleX and OpenCV only when they are needed
+        from generate_mathml import GenerateMathmlInPdf
+
         generateMathml = GenerateMathmlInPdf(license_name, license_key, input_path, output_path)
         generateMathml.process_file()
-    elif re.search(IMAGE_FILE_EXT_REGEX, input_path, re.IGNORECASE) and output_path.lower().endswith(".xml"):
+    elif IMAGE_FILE_EXT_PATTERN.search(input_path) and output_path_lower.endswith(".xml"):
+        from generate_mathml import GenerateMathmlFromImage
+
         ai = GenerateMathmlFromImage(input_path, output_path)
         ai.process_image()
     else:
@@ -427,29 +322,7 @@ def create_threshold_dictionary(args) -> dict:
         dict: Dictionary containing threshold values.
     """
     return {
-        0: clamp(float(args.threshold_paragraph_title), 0.05, 0.95),
-        1: clamp(float(args.threshold_image), 0.05, 0.95),
-        2: clamp(float(args.threshold_text), 0.05, 0.95),
-        3: clamp(float(args.threshold_number), 0.05, 0.95),
-        4: clamp(float(args.threshold_abstract), 0.05, 0.95),
-        5: clamp(float(args.threshold_content), 0.05, 0.95),
-        6: clamp(float(args.threshold_figure_title), 0.05, 0.95),
-        7: clamp(float(args.threshold_formula), 0.05, 0.95),
-        8: clamp(float(args.threshold_table), 0.05, 0.95),
-        9: clamp(float(args.threshold_table_title), 0.05, 0.95),
-        10: clamp(float(args.threshold_reference), 0.05, 0.95),
-        11: clamp(float(args.threshold_doc_title), 0.05, 0.95),
-        12: clamp(float(args.threshold_footnote), 0.05, 0.95),
-        13: clamp(float(args.threshold_header), 0.05, 0.95),
-        14: clamp(float(args.threshold_algorithm), 0.05, 0.95),
-        15: clamp(float(args.threshold_footer), 0.05, 0.95),
-        16: clamp(float(args.threshold_seal), 0.05, 0.95),
-        17: clamp(float(args.threshold_chart_title), 0.05, 0.95),
-        18: clamp(float(args.threshold_chart), 0.05, 0.95),
-        19: clamp(float(args.threshold_formula_number), 0.05, 0.95),
-        20: clamp(float(args.threshold_header_image), 0.05, 0.95),
-        21: clamp(float(args.threshold_footer_image), 0.05, 0.95),
-        22: clamp(float(args.threshold_aside_text), 0.05, 0.95),
+        class_id: clamp(float(getattr(args, name)), 0.05, 0.95) for class_id, name in enumerate(THRESHOLD_ARGUMENTS)
     }
 
 
@@ -460,32 +333,6 @@ def main() -> None:
 
     subparsers = parser.add_subparsers(dest="subparser")
 
-    threshold_arguments = [
-        "threshold_paragraph_title",
-        "threshold_image",
-        "threshold_text",
-        "threshold_number",
-        "threshold_abstract",
-        "threshold_content",
-        "threshold_figure_title",
-        "threshold_formula",
-        "threshold_table",
-        "threshold_table_title",
-        "threshold_reference",
-        "threshold_doc_title",
-        "threshold_footnote",
-        "threshold_header",
-        "threshold_algorithm",
-        "threshold_footer",
-        "threshold_seal",
-        "threshold_chart_title",
-        "threshold_chart",
-        "threshold_formula_number",
-        "threshold_header_image",
-        "threshold_footer_image",
-        "threshold_aside_text",
-    ]
-
     # Config subparser
     config_subparser = subparsers.add_parser(
         "config",
@@ -500,7 +347,7 @@ def main() -> None:
         help="Run AutoTag of PDF document.",
     )
     tagging_arguments = ["name", "key", "input", "output", "model", "zoom", "process_formula", "process_table"]
-    set_arguments(autotag_subparser, tagging_arguments + threshold_arguments, True, "PDF", "PDF")
+    set_arguments(autotag_subparser, tagging_arguments + list(THRESHOLD_ARGUMENTS), True, "PDF", "PDF")
     autotag_subparser.set_defaults(func=run_autotag_subcommand)
 
     # Template subparser
@@ -509,7 +356,7 @@ def main() -> None:
         help="Create layout template JSON.",
     )
     template_arguments = ["name", "key", "input", "output", "model", "zoom", "process_table"]
-    set_arguments(template_subparser, template_arguments + threshold_arguments, True, "PDF", "JSON")
+    set_arguments(template_subparser, template_arguments + list(THRESHOLD_ARGUMENTS), True, "PDF", "JSON")
     template_subparser.set_defaults(func=run_template_subcommand)
 
     # MathML subparser
@@ -539,11 +386,15 @@ def main() -> None:
         sys.exit(1)
 
     if hasattr(args, "func"):
-        # Check for updates only when help is not checked
-        update_checker = DockerImageContainerUpdateChecker()
-        # Check it in separate thread not to be delayed when there is slow or no internet connection
-        update_thread = threading.Thread(target=update_checker.check_for_image_updates)
-        update_thread.start()
+        # Check for updates only when help is not checked and subcommand does more than copying config
+        update_thread: Optional[threading.Thread] = None
+        if not SKIP_UPDATE_CHECK and args.subparser != "config":
+            from image_update import DockerImageContainerUpdateChecker
+
+            update_checker = DockerImageContainerUpdateChecker()
+            # Check it in separate daemon thread not to be delayed when there is slow or no internet connection
+            update_thread = threading.Thread(target=update_checker.check_for_image_updates, daemon=True)
+            update_thread.start()
 
         # Run subcommand
         try:
@@ -556,8 +407,9 @@ def main() -> None:
             print(f"Failed to run the program: {e}", file=sys.stderr)
             sys.exit(1)
         finally:
-            # Make sure to let update thread finish before exiting
-            update_thread.join()
+            # Give update thread short time to finish, do not wait for slow network before exiting
+            if update_thread is not None:
+                update_thread.join(UPDATE_CHECK_TIMEOUT)
     else:
         parser.print_help()
 
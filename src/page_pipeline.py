@@ -0,0 +1,164 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import cv2
+from pdfixsdk import PdfDoc, Pdfix, PdfPage, PdfPageView, kRotate0
+from tqdm import tqdm
+
+from ai import PaddleXEngine
+from constants import PERCENT_AI, PERCENT_RENDER, PERCENT_TEMPLATE
+from exceptions import PdfixException
+from page_renderer import create_image_from_pdf_page
+from template_json import TemplateJsonCreator
+from utils_sdk import page_has_content
+
+
+class PdfPagesPipeline:
+    """
+    Class that renders PDF document pages, lets PaddleX analyse them and creates template json for each page.
+
+    PDFix calls stay on the calling thread, AI analysis of one page runs in the worker thread while the next page
+    is rendered. At most two pages are held at once.
+    """
+
+    def __init__(
+        self,
+        pdfix: Pdfix,
+        zoom: float,
+        paddlex: PaddleXEngine,
+        template_json_creator: TemplateJsonCreator,
+        failure_exception: Callable[[Pdfix, str], PdfixException],
+    ) -> None:
+        """
+        Initialize pipeline for processing pages of one PDF document.
+
+        Args:
+            pdfix (Pdfix): Pdfix SDK.
+            zoom (float): Zoom level for rendering the page.
+            paddlex (PaddleXEngine): PaddleX engine instance for processing.
+            template_json_creator (TemplateJsonCreator): Template JSON creator that collects results of pages.
+            failure_exception (Callable[[Pdfix, str], PdfixException]): Exception raised when page
+                or page view cannot be acquired.
+        """
+        self.pdfix: Pdfix = pdfix
+        self.zoom: float = zoom
+        self.paddlex: PaddleXEngine = paddlex
+        self.template_json_creator: TemplateJsonCreator = template_json_creator
+        self.failure_exception: Callable[[Pdfix, str], PdfixException] = failure_exception
+
+    def process_pages(self, doc: PdfDoc, id: str, progress_bar: tqdm, total_units_for_page_processing: float) -> None:
+        """
+        Create template json for all PDF document pages.
+
+        Args:
+            doc (PdfDoc): Opened PDF document.
+            id (string): PDF document name.
+            progress_bar (tqdm): Progress bar.
+            total_units_for_page_processing (float): How many units progress bar needs to update for one page.
+        """
+        render_step_units: float = total_units_for_page_processing * PERCENT_RENDER
+        ai_step_units: float = total_units_for_page_processing * PERCENT_AI
+        template_step_units: float = total_units_for_page_processing * PERCENT_TEMPLATE
+
+        pages_in_progress: deque[tuple[int, PdfPage, PdfPageView, Future[dict]]] = deque()
+        with ThreadPoolExecutor(max_workers=1) as ai_executor:
+            try:
+                for page_index in range(0, doc.GetNumPages()):
+                    # Acquire the page
+                    page: Optional[PdfPage] = doc.AcquirePage(page_index)
+                    if page is None:
+                        raise self.failure_exception(self.pdfix, "Unable to acquire the page")
+
+                    page_number: int = page_index + 1
+                    page_in_progress: bool = False
+                    try:
+                        # Pages without any content have nothing to tag, skip rendering and AI
+                        if not page_has_content(page):
+                            progress_bar.update(total_units_for_page_processing)
+                            continue
+
+                        # Render the page as an image
+                        page_view, image = self._render_page(page)
+                        progress_bar.update(render_step_units)
+
+                        # Run layout model analysis and formula and table model analysis using the PaddleX engine
+                        future: Future[dict] = ai_executor.submit(
+                            self.paddlex.process_pdf_page_image_with_ai,
+                            image,
+                            id,
+                            page_number,
+                            progress_bar,
+                            ai_step_units,
+                        )
+                        pages_in_progress.append((page_number, page, page_view, future))
+                        page_in_progress = True
+                    finally:
+                        # Release the page unless it was handed over to pages in progress
+                        if not page_in_progress:
+                            page.Release()
+
+                    # Previous page finishes while this one is analysed
+                    if len(pages_in_progress) > 1:
+                        self._finish_page(pages_in_progress.popleft(), progress_bar, template_step_units)
+
+                while pages_in_progress:
+                    self._finish_page(pages_in_progress.popleft(), progress_bar, template_step_units)
+            finally:
+                # Clean-up pages left over after failure
+                for _, page, page_view, future in pages_in_progress:
+                    future.cancel()
+                    page_view.Release()
+                    page.Release()
+
+    def _render_page(self, page: PdfPage) -> tuple[PdfPageView, cv2.typing.MatLike]:
+        """
+        Acquire page view and render current PDF document page as an image.
+
+        Args:
+            page (PdfPage): The PDF document page to render.
+
+        Returns:
+            Page view that must be released by the caller and rendered image.
+        """
+        # Define zoom level and rotation for rendering the page
+        page_view: Optional[PdfPageView] = page.AcquirePageView(self.zoom, kRotate0)
+        if page_view is None:
+            raise self.failure_exception(self.pdfix, "Unable to acquire page view")
+
+        try:
+            image: cv2.typing.MatLike = create_image_from_pdf_page(self.pdfix, page, page_view)
+        except BaseException:
+            # PDFix exceptions are not derived from Exception
+            page_view.Release()
+            raise
+
+        return page_view, image
+
+    def _finish_page(
+        self,
+        page_in_progress: tuple[int, PdfPage, PdfPageView, Future[dict]],
+        progress_bar: tqdm,
+        template_step_units: float,
+    ) -> None:
+        """
+        Wait for AI results of rendered page and create template json for it.
+
+        Args:
+            page_in_progress (tuple[int, PdfPage, PdfPageView, Future[dict]]): Page number, page, its page view
+                and pending PaddleX results. Page and page view are released.
+            progress_bar (tqdm): Progress bar.
+            template_step_units (float): How many units progress bar needs to update.
+        """
+        page_number, page, page_view, future = page_in_progress
+
+        try:
+            results: dict = future.result()
+
+            # Create template json from PaddleX results for this page
+            self.template_json_creator.process_page(results, page_number, page_view, self.zoom)
+            progress_bar.update(template_step_units)
+        finally:
+            # Release resources
+            page_view.Release()
+            page.Release()
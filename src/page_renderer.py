@@ -1,23 +1,21 @@
 import base64
-import tempfile
+import ctypes
+import math
 from typing import Optional
 
 import cv2
 import numpy as np
 from pdfixsdk import (
-    PdfDevRect,
     PdfDoc,
-    PdfImageParams,
     Pdfix,
+    PdfMatrix,
     PdfPage,
     PdfPageRenderParams,
     PdfPageView,
     PdfRect,
-    PsFileStream,
     PsImage,
+    PsMemoryStream,
     kImageDIBFormatArgb,
-    kImageFormatJpg,
-    kPsTruncate,
     kRotate0,
 )
 
@@ -56,38 +54,11 @@ def create_image_from_pdf_page(pdfix: Pdfix, pdf_page: PdfPage, page_view: PdfPa
         if not pdf_page.DrawContent(render_params):
             raise PdfixFailedToRenderException(pdfix, "Unable to draw the content")
 
-        # Save the renderred image to a temporary file in JPG format
-        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as temp_file:
-            file_stream: Optional[PsFileStream] = pdfix.CreateFileStream(temp_file.name, kPsTruncate)
-            if file_stream is None:
-                raise PdfixFailedToRenderException(pdfix, "Unable to create file stream")
-
-            try:
-                # Set image parameters (format and quality)
-                image_params: PdfImageParams = PdfImageParams()
-                image_params.format = kImageFormatJpg
-                image_params.quality = 100
-
-                # Save the image to the file stream
-                if not page_image.SaveToStream(file_stream, image_params):
-                    raise PdfixFailedToRenderException(pdfix, "Unable to save the image to the stream")
-
-            except Exception:
-                raise
-            finally:
-                # Clean up resources
-                file_stream.Destroy()
-
-            # Return the saved image as a NumPy array using OpenCV
-            return cv2.imread(temp_file.name)
-    except Exception:
-        raise
+        # Take raw pixel data of the rendered image without encoding it
+        return _convert_ps_image_to_matlike_image(pdfix, page_image, page_width, page_height)
     finally:
         page_image.Destroy()
 
-    black_pixel: cv2.typing.MatLike = np.zeros((1, 1, 3), dtype=np.uint8)
-    return black_pixel
-
 
 def create_image_from_part_of_page(image: cv2.typing.MatLike, box: list, offset: int) -> cv2.typing.MatLike:
     """
@@ -118,25 +89,26 @@ def convert_base64_image_to_matlike_image(base64_data: str) -> cv2.typing.MatLik
     Returns:
         MatLike image
     """
-    header, encoded = base64_data.split(",", 1)
+    # Skip the data URI header without keeping it
+    encoded: str = base64_data.partition(",")[2] or base64_data
     image_data: bytes = base64.b64decode(encoded)
-    numpy_array: cv2.typing.MatLike = np.frombuffer(image_data, np.uint8)
+    numpy_array: np.ndarray = np.frombuffer(image_data, np.uint8)
     return cv2.imdecode(numpy_array, cv2.IMREAD_COLOR)
 
 
-def render_element_to_image(pdfix: Pdfix, doc: PdfDoc, page_num: int, bbox: PdfRect, zoom: float) -> cv2.typing.MatLike:
+def render_page_to_image(pdfix: Pdfix, doc: PdfDoc, page_num: int, zoom: float) -> tuple[cv2.typing.MatLike, PdfMatrix]:
     """
-    Render element from document into opencv image.
+    Render whole page from document into opencv image.
 
     Args:
         pdfix (Pdfix): PDFix SDK.
         doc (PdfDoc): The PDF document to render.
-        page_num (int): The page number where element is located.
-        bbox (PdfRect): The bounding box of element to render.
+        page_num (int): The page number to render.
         zoom (float): The zoom level for rendering.
 
     Returns:
-        The rendered element as MatLike object.
+        The rendered page as MatLike object.
+        Page to device matrix used for rendering.
     """
     page: Optional[PdfPage] = doc.AcquirePage(page_num)
     if page is None:
@@ -148,62 +120,73 @@ def render_element_to_image(pdfix: Pdfix, doc: PdfDoc, page_num: int, bbox: PdfR
             raise PdfixFailedToRenderException(pdfix, "Unable to acquire page view")
 
         try:
-            # Convert PDF Rect to Image Rect
-            rect: PdfDevRect = page_view.RectToDevice(bbox)
-
-            # Set up rendering parameters
-            render_parameters: PdfPageRenderParams = PdfPageRenderParams()
-            render_parameters.matrix = page_view.GetDeviceMatrix()
-            render_parameters.clip_box = bbox
-            ps_image: Optional[PsImage] = pdfix.CreateImage(
-                rect.right - rect.left,
-                rect.bottom - rect.top,
-                kImageDIBFormatArgb,
-            )
-            if ps_image is None:
-                raise PdfixFailedToRenderException(pdfix, "Unable to create the image")
-
-            render_parameters.image = ps_image
-
-            try:
-                # Render the page element content onto the image
-                if not page.DrawContent(render_parameters):
-                    raise PdfixFailedToRenderException(pdfix, "Unable to draw the content")
-
-                with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as temp_file:
-                    file_stream: Optional[PsFileStream] = pdfix.CreateFileStream(temp_file.name, kPsTruncate)
-                    if file_stream is None:
-                        raise PdfixFailedToRenderException(pdfix, "Unable to create file stream")
-
-                    try:
-                        # Set image parameters (format and quality)
-                        image_params: PdfImageParams = PdfImageParams()
-                        image_params.format = kImageFormatJpg
-                        image_params.quality = 100
-
-                        # Save the image to the file stream
-                        if not render_parameters.image.SaveToStream(file_stream, image_params):
-                            raise PdfixFailedToRenderException(pdfix, "Unable to save the image to the stream")
-
-                    except Exception:
-                        raise
-                    finally:
-                        file_stream.Destroy()
-
-                    # Return the saved image as a NumPy array using OpenCV
-                    return cv2.imread(temp_file.name)
-            except Exception:
-                raise
-            finally:
-                render_parameters.image.Destroy()
-        except Exception:
-            raise
+            return create_image_from_pdf_page(pdfix, page, page_view), page_view.GetDeviceMatrix()
         finally:
             page_view.Release()
-    except Exception:
-        raise
     finally:
         page.Release()
 
-    black_pixel: cv2.typing.MatLike = np.zeros((1, 1, 3), dtype=np.uint8)
-    return black_pixel
+
+def create_image_from_rect_of_page(
+    image: cv2.typing.MatLike, device_matrix: PdfMatrix, bbox: PdfRect
+) -> cv2.typing.MatLike:
+    """
+    Takes rendered PDF page and cuts PDF rect (e.g. bounding box of element) from it.
+
+    Args:
+        image (cv2.typing.MatLike): Rendered PDF page.
+        device_matrix (PdfMatrix): Page to device matrix used for rendering the page.
+        bbox (PdfRect): The bounding box in PDF coordinates.
+
+    Returns:
+        Cut image as MatLike object, empty when rect is outside of the page.
+    """
+    # Transform all corners to device coordinates (x' = a*x + c*y + e, y' = b*x + d*y + f)
+    xs: list[float] = []
+    ys: list[float] = []
+    for x, y in ((bbox.left, bbox.bottom), (bbox.left, bbox.top), (bbox.right, bbox.bottom), (bbox.right, bbox.top)):
+        xs.append(device_matrix.a * x + device_matrix.c * y + device_matrix.e)
+        ys.append(device_matrix.b * x + device_matrix.d * y + device_matrix.f)
+
+    # Whole pixels covering the rect, limited to the page image
+    min_x: int = max(math.floor(min(xs)), 0)
+    min_y: int = max(math.floor(min(ys)), 0)
+    max_x: int = min(math.ceil(max(xs)), image.shape[1])
+    max_y: int = min(math.ceil(max(ys)), image.shape[0])
+    return image[min_y:max_y, min_x:max_x]
+
+
+def _convert_ps_image_to_matlike_image(pdfix: Pdfix, ps_image: PsImage, width: int, height: int) -> cv2.typing.MatLike:
+    """
+    Converts raw ARGB data of rendered PDFix image to cv2 MatLike (numpy array) BGR image.
+
+    Args:
+        pdfix (Pdfix): Pdfix SDK.
+        ps_image (PsImage): Rendered image in kImageDIBFormatArgb format.
+        width (int): Width of the image in pixels.
+        height (int): Height of the image in pixels.
+
+    Returns:
+        Image as MatLike object.
+    """
+    memory_stream: Optional[PsMemoryStream] = pdfix.CreateMemStream()
+    if memory_stream is None:
+        raise PdfixFailedToRenderException(pdfix, "Unable to create memory stream")
+
+    try:
+        if not ps_image.SaveDataToStream(memory_stream):
+            raise PdfixFailedToRenderException(pdfix, "Unable to save the image data to the stream")
+
+        size: int = memory_stream.GetSize()
+        raw_data: ctypes.Array[ctypes.c_ubyte] = (ctypes.c_ubyte * size)()
+        if not memory_stream.Read(0, raw_data, size):
+            raise PdfixFailedToRenderException(pdfix, "Unable to read the image data from the stream")
+    finally:
+        memory_stream.Destroy()
+
+    # Rows can be padded, so take stride from data size and cut padding off
+    stride: int = size // height
+    pixels: np.ndarray = np.ctypeslib.as_array(raw_data).reshape(height, stride)[:, : width * 4]
+
+    # DIB ARGB is stored as BGRA bytes, conversion also copies the data out of the ctypes buffer
+    return cv2.cvtColor(pixels.reshape(height, width, 4), cv2.COLOR_BGRA2BGR)
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class PaddleXPostProcessingTable:
     """
     Class that take PaddleX results for cell recognition and creates each cell with information:
@@ -34,7 +37,10 @@ class PaddleXPostProcessingTable:
                 "cells": [],
             }
 
-        row_lines, column_lines = self._create_table_row_and_column_lines(cell_results)
+        # All cell boxes as one array: [min_x, min_y, max_x, max_y]
+        boxes: np.ndarray = np.array([box["coordinate"][:4] for box in cell_results["boxes"]], dtype=np.float64)
+
+        row_lines, column_lines = self._create_table_row_and_column_lines(boxes)
 
         number_rows: int = len(row_lines) - 1
         number_columns: int = len(column_lines) - 1
@@ -42,32 +48,32 @@ class PaddleXPostProcessingTable:
         table_min_x: float = coordinate[0]
         table_min_y: float = coordinate[1]
 
-        cells_with_data: list = []
-        for box in cell_results["boxes"]:
-            min_x: float = box["coordinate"][0]
-            min_y: float = box["coordinate"][1]
-            max_x: float = box["coordinate"][2]
-            max_y: float = box["coordinate"][3]
-
-            row_min_index, row_max_index, row_number, row_span = self._calculate_indexes_position_span(
-                int(min_y), int(max_y), row_lines
-            )
-            column_min_index, column_max_index, column_number, column_span = self._calculate_indexes_position_span(
-                int(min_x), int(max_x), column_lines
-            )
+        # Find closest lines for cell borders of all cells at once (coordinates are truncated to whole pixels)
+        cell_borders: np.ndarray = boxes.astype(np.int64)
+        row_min_indexes: list[int] = self._find_line_indexes(cell_borders[:, 1], row_lines).tolist()
+        row_max_indexes: list[int] = self._find_line_indexes(cell_borders[:, 3], row_lines).tolist()
+        column_min_indexes: list[int] = self._find_line_indexes(cell_borders[:, 0], column_lines).tolist()
+        column_max_indexes: list[int] = self._find_line_indexes(cell_borders[:, 2], column_lines).tolist()
+
+        row_line_values: list[int] = row_lines.tolist()
+        column_line_values: list[int] = column_lines.tolist()
 
+        cells_with_data: list = []
+        for row_min_index, row_max_index, column_min_index, column_max_index in zip(
+            row_min_indexes, row_max_indexes, column_min_indexes, column_max_indexes
+        ):
             bbox: list = [
-                column_lines[column_min_index],
-                row_lines[row_min_index],
-                column_lines[column_max_index],
-                row_lines[row_max_index],
+                column_line_values[column_min_index],
+                row_line_values[row_min_index],
+                column_line_values[column_max_index],
+                row_line_values[row_max_index],
             ]
 
             cell_result: dict = {
-                "row": row_number,
-                "column": column_number,
-                "row_span": row_span,
-                "column_span": column_span,
+                "row": row_min_index + 1,
+                "column": column_min_index + 1,
+                "row_span": row_max_index - row_min_index,
+                "column_span": column_max_index - column_min_index,
                 "box": bbox,
                 "bbox": [table_min_x + bbox[0], table_min_y + bbox[1], table_min_x + bbox[2], table_min_y + bbox[3]],
             }
@@ -121,101 +127,60 @@ class PaddleXPostProcessingTable:
         # Convert grid to flat list (with bonus already being sorted)
         return [cell for row in output_cells for cell in row]
 
-    def _create_table_row_and_column_lines(self, result: dict) -> tuple[list, list]:
+    def _create_table_row_and_column_lines(self, boxes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
         """
         From results of table cell recognition create all table lines
 
         Args:
-            result (dict): Result from table cell recognition
+            boxes (np.ndarray): Cell boxes from table cell recognition, one [min_x, min_y, max_x, max_y] per row
 
         Returns:
             Table row lines
             Table column lines
         """
-        row_lines: list = self._create_lines(result, 1, 3)
-        column_lines: list = self._create_lines(result, 0, 2)
+        row_lines: np.ndarray = self._create_lines(boxes, 1, 3)
+        column_lines: np.ndarray = self._create_lines(boxes, 0, 2)
         row_lines = self._clean_lines(row_lines)
         column_lines = self._clean_lines(column_lines)
 
         return row_lines, column_lines
 
-    def _create_lines(self, result: dict, min_index: int, max_index: int) -> list:
+    def _create_lines(self, boxes: np.ndarray, min_index: int, max_index: int) -> np.ndarray:
         """
-        Create unsorted list of all lines in that direction with duplicates
+        Create sorted array of all lines in that direction without exact duplicates
 
         Args:
-            result (dict): Result from table cell recognition
+            boxes (np.ndarray): Cell boxes from table cell recognition
             min_index (int): Index into bbox coordinates
             max_index (list): Index into bbox coordinates
 
         Returns:
-            List of all lines
-        """
-        lines: list = []
-
-        for box in result["boxes"]:
-            min_line: int = round(box["coordinate"][min_index])
-            max_line: int = round(box["coordinate"][max_index])
-            if min_line not in lines:
-                lines.append(min_line)
-            if max_line not in lines:
-                lines.append(max_line)
-
-        return lines
-
-    def _clean_lines(self, lines: list) -> list:
-        """
-        Sort and remove duplicates
-
-        Args:
-            lines (list): List of lines
-
-        Returns:
-            List of all lines sorted and without duplicates
+            Array of all lines
         """
-        lines.sort()
-        previous_line: int = -10
-        result_lines: list = []
-
-        for line in lines:
-            # all lines close to each other (2 pixels) are ignored
-            if line - previous_line > 2:
-                result_lines.append(line)
-            previous_line = line
+        return np.unique(np.round(boxes[:, [min_index, max_index]]).astype(np.int64))
 
-        return result_lines
-
-    def _calculate_indexes_position_span(self, min: int, max: int, lines: list) -> tuple[int, int, int, int]:
+    def _clean_lines(self, lines: np.ndarray) -> np.ndarray:
         """
-        Calculate cell position and cell span in one direction
+        Remove lines that are close to previous line
 
         Args:
-            min (int): cell's min coordinate in one direction
-            max (int): cell's max coordinate in one direction
-            lines (list): List of all table lines in one direction
+            lines (np.ndarray): Sorted array of lines
 
         Returns:
-            Cell min line index
-            Cell max line index
-            Cell position in one direction
-            Cell span in one direction
+            Array of all lines sorted and without duplicates
         """
-        min_index: int = self._find_line_index(min, lines)
-        max_index: int = self._find_line_index(max, lines)
-
-        span: int = max_index - min_index
-        position: int = min_index + 1
-        return min_index, max_index, position, span
+        # all lines close to each other (2 pixels) are ignored
+        return lines[np.diff(lines, prepend=-10) > 2]
 
-    def _find_line_index(self, target_line: int, lines: list) -> int:
+    def _find_line_indexes(self, target_lines: np.ndarray, lines: np.ndarray) -> np.ndarray:
         """
-        Find index of closest line to target_line
+        Find index of closest line for each of target lines
 
         Args:
-            target_line (int): Line that we want closest index
-            lines (list): List of all lines
+            target_lines (np.ndarray): Lines that we want closest index for
+            lines (np.ndarray): Array of all lines
 
         Returns:
-            Index of line in lines
+            Indexes of lines in lines (first one on tie)
         """
-        return min(range(len(lines)), key=lambda i: abs(lines[i] - target_line))
+        return np.abs(target_lines[:, np.newaxis] - lines[np.newaxis, :]).argmin(axis=1)
@@ -1,21 +1,59 @@
 import json
-import math
 import sys
 from datetime import date
-from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
-from pdfixsdk import PdfDevRect, PdfPageView, PdfRect, __version__, kPdeImage
+import numpy as np
+from pdfixsdk import PdfMatrix, PdfPageView, __version__, kPdeImage
 
-from constants import CONFIG_FILE
+from constants import CONFIG_FILE, CONFIG_PATH
 from process_bboxes import bboxes_overlaps
 
+# Text element that is kept as detected
+DEFAULT_ELEMENT_PROPERTIES: dict[str, str] = {
+    "flag": "no_join|no_split",
+    "text_flag": "no_new_line",
+    "type": "pde_text",
+}
+
+# Template element properties for each PaddleX layout label
+LABEL_ELEMENT_PROPERTIES: dict[str, dict[str, str]] = {
+    "abstract": DEFAULT_ELEMENT_PROPERTIES,
+    "algorithm": DEFAULT_ELEMENT_PROPERTIES,
+    "aside_text": {"flag": "artifact|no_join|no_split", "text_flag": "no_new_line", "type": "pde_text"},
+    "chart": {"flag": "no_join|no_split", "type": "pde_image"},
+    "chart_title": {"tag": "Caption", **DEFAULT_ELEMENT_PROPERTIES},
+    "content": DEFAULT_ELEMENT_PROPERTIES,
+    "doc_title": {"tag": "Title", **DEFAULT_ELEMENT_PROPERTIES},
+    "figure_title": {"tag": "Caption", **DEFAULT_ELEMENT_PROPERTIES},
+    "footer": {"flag": "footer|artifact|no_join|no_split", "text_flag": "no_new_line", "type": "pde_text"},
+    "footer_image": {"flag": "footer|artifact|no_join|no_split", "type": "pde_image"},
+    "footnote": DEFAULT_ELEMENT_PROPERTIES,
+    "formula": {"tag": "Formula", "flag": "no_join|no_split", "type": "pde_image"},
+    "formula_number": DEFAULT_ELEMENT_PROPERTIES,
+    "header": {"flag": "header|artifact|no_join|no_split", "text_flag": "no_new_line", "type": "pde_text"},
+    "header_image": {"flag": "header|artifact|no_join|no_split", "type": "pde_image"},
+    "image": {"flag": "no_join|no_split", "type": "pde_image"},
+    # "header" or "footer" is prepended according to position on page
+    "number": {"flag": "artifact|no_join|no_split", "text_flag": "no_new_line", "type": "pde_text"},
+    "paragraph_title": {"heading": "h1", **DEFAULT_ELEMENT_PROPERTIES},
+    # Do not tag as "Reference" as Paddle fails to detect each [1], [2], ... as separate reference
+    # and groups them together. Normal "P" is better in this case.
+    "reference": DEFAULT_ELEMENT_PROPERTIES,
+    "seal": {"flag": "artifact|no_join|no_split", "type": "pde_image"},
+    "table": {"flag": "no_join|no_split", "type": "pde_table"},
+    "table_title": {"tag": "Caption", **DEFAULT_ELEMENT_PROPERTIES},
+    "text": DEFAULT_ELEMENT_PROPERTIES,
+}
+
 
 class TemplateJsonCreator:
     """
     Class that prepares each page and in the end creates whole template json file for PDFix-SDK
     """
 
+    __slots__ = ("template_json_pages", "formulas")
+
     def __init__(self) -> None:
         """
         Initializes pdfix sdk template json creation by preparing list for each page.
@@ -104,9 +142,8 @@ class TemplateJsonCreator:
         Returns:
             The current version of the Docker image.
         """
-        config_path: Path = Path(__file__).parent.joinpath(f"../{CONFIG_FILE}").resolve()
         try:
-            with open(config_path, "r", encoding="utf-8") as f:
+            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
                 config = json.load(f)
                 return config.get("version", "unknown")
         except (FileNotFoundError, json.JSONDecodeError) as e:
@@ -162,6 +199,16 @@ class TemplateJsonCreator:
         if "boxes" not in results:
             return elements
 
+        # Convert bounding boxes of all regions to PDF coordinates at once (device rects rounded outwards)
+        device_rects: np.ndarray = np.array(
+            [result["coordinate"][:4] for result in results["boxes"]], dtype=np.float64
+        ).reshape(-1, 4)
+        device_rects = np.hstack((np.floor(device_rects[:, :2]), np.ceil(device_rects[:, 2:])))
+        page_bboxes: dict[int, list[float]] = {
+            id(result): page_bbox
+            for result, page_bbox in zip(results["boxes"], self._device_rects_to_page(page_view, device_rects).tolist())
+        }
+
         for result in results["boxes"]:
             # get all other regions that overlaps with this one
             overlaps: list = self._find_overlaps(result, results["boxes"])
@@ -173,7 +220,7 @@ class TemplateJsonCreator:
                 continue
 
             # create template json data for region
-            element: dict = self._convert_result_into_element(result, page_view, page_number)
+            element: dict = self._convert_result_into_element(result, page_bboxes[id(result)], page_view, page_number)
 
             # keep only formula ones
             formula_overlaps: list = [overlap for overlap in overlaps if overlap["label"] == "formula"]
@@ -181,7 +228,9 @@ class TemplateJsonCreator:
                 # add all overlapping formulas under this text
                 formula_elements: list = []
                 for formula in formula_overlaps:
-                    formula_element = self._convert_result_into_element(formula, page_view, page_number)
+                    formula_element = self._convert_result_into_element(
+                        formula, page_bboxes[id(formula)], page_view, page_number
+                    )
                     formula_elements.append(formula_element)
                 element["element_template"] = {
                     "template": {
@@ -216,12 +265,15 @@ class TemplateJsonCreator:
 
         return overlaps
 
-    def _convert_result_into_element(self, result: dict, page_view: PdfPageView, page_number: int) -> dict:
+    def _convert_result_into_element(
+        self, result: dict, page_bbox: list[float], page_view: PdfPageView, page_number: int
+    ) -> dict:
         """
         Convert one region from paddle results into template json element
 
         Args:
             result (dict): On result from Paddle.
+            page_bbox (list[float]): Bounding box of result in PDF coordinates [left, bottom, right, top].
             page_view (PdfPageView): The view of the PDF page used for coordinate conversion.
             page_number (int): PDF file page number.
 
@@ -230,124 +282,17 @@ class TemplateJsonCreator:
         """
         element: dict[str, Any] = {}
 
-        rect: PdfDevRect = PdfDevRect()
-        rect.left = math.floor(result["coordinate"][0])  # min_x
-        rect.top = math.floor(result["coordinate"][1])  # min_y
-        rect.right = math.ceil(result["coordinate"][2])  # max_x
-        rect.bottom = math.ceil(result["coordinate"][3])  # max_y
-        bbox: PdfRect = page_view.RectToPage(rect)
-        element["bbox"] = [str(bbox.left), str(bbox.bottom), str(bbox.right), str(bbox.top)]
+        element["bbox"] = [str(value) for value in page_bbox]
         label: str = result["label"].lower()
         element["comment"] = f"{label} {round(result['score'] * 100)}%"
 
-        # Determine element type
+        # Special handling of some element types
         match label:
-            case "abstract":
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "algorithm":
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "aside_text":
-                element["flag"] = "artifact|no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "chart":
-                element["flag"] = "no_join|no_split"
-                element["type"] = "pde_image"
-
-            case "chart_title":
-                element["tag"] = "Caption"
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "content":
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "doc_title":
-                element["tag"] = "Title"
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "figure_title":
-                element["tag"] = "Caption"
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "footer":
-                element["flag"] = "footer|artifact|no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "footer_image":
-                element["flag"] = "footer|artifact|no_join|no_split"
-                element["type"] = "pde_image"
-
-            case "footnote":
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
             case "formula":
                 if "custom" in result:
                     formula_id = self._generate_unique_id(page_number, kPdeImage, result["coordinate"])
                     self.formulas.append((formula_id, result["custom"]))
                     element["id"] = str(formula_id)
-                element["tag"] = "Formula"
-                element["flag"] = "no_join|no_split"
-                element["type"] = "pde_image"
-
-            case "formula_number":
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "header":
-                element["flag"] = "header|artifact|no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "header_image":
-                element["flag"] = "header|artifact|no_join|no_split"
-                element["type"] = "pde_image"
-
-            case "image":
-                element["flag"] = "no_join|no_split"
-                element["type"] = "pde_image"
-
-            case "number":
-                number_flag = self._is_footer_or_header(page_view, bbox)
-                element["flag"] = f"{number_flag}|artifact|no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "paragraph_title":
-                element["heading"] = "h1"
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "reference":
-                # Do not tag as "Reference" as Paddle fails to detect each [1], [2], ... as separate reference
-                # and groups them together. Normal "P" is better in this case.
-                # element["tag"] = "Reference"
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
-
-            case "seal":
-                element["flag"] = "artifact|no_join|no_split"
-                element["type"] = "pde_image"
 
             case "table":
                 if "custom" in result:
@@ -360,24 +305,13 @@ class TemplateJsonCreator:
                     }
                     element["row_num"] = result["custom"]["rows"]
                     element["col_num"] = result["custom"]["columns"]
-                element["flag"] = "no_join|no_split"
-                element["type"] = "pde_table"
-
-            case "table_title":
-                element["tag"] = "Caption"
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
 
-            case "text":
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
+        # Determine element type
+        element.update(LABEL_ELEMENT_PROPERTIES.get(label, DEFAULT_ELEMENT_PROPERTIES))
 
-            case _:
-                element["flag"] = "no_join|no_split"
-                element["text_flag"] = "no_new_line"
-                element["type"] = "pde_text"
+        if label == "number":
+            number_flag = self._is_footer_or_header(page_view, page_bbox[3])
+            element["flag"] = f"{number_flag}|{element['flag']}"
 
         return element
 
@@ -395,6 +329,14 @@ class TemplateJsonCreator:
         """
         cells: list = []
 
+        # Convert all cell bounding boxes to PDF coordinates at once
+        device_rects: np.ndarray = np.array(
+            [cell["bbox"][:4] for cell in result["cells"] if "bbox" in cell], dtype=np.float64
+        ).reshape(-1, 4)
+        # Round device rects inwards (min up, max down)
+        device_rects = np.hstack((np.ceil(device_rects[:, :2]), np.floor(device_rects[:, 2:])))
+        page_bboxes: Iterator[list[float]] = iter(self._device_rects_to_page(page_view, device_rects).tolist())
+
         for cell in result["cells"]:
             cell_position: str = f"[{cell['row']}, {cell['column']}]"
             cell_span: str = f"[{cell['row_span']}, {cell['column_span']}]"
@@ -413,18 +355,36 @@ class TemplateJsonCreator:
             # create_cell["cell_scope"] = "0"
 
             if "bbox" in cell:
-                rect: PdfDevRect = PdfDevRect()
-                rect.left = math.ceil(cell["bbox"][0])  # min_x
-                rect.top = math.ceil(cell["bbox"][1])  # min_y
-                rect.right = math.floor(cell["bbox"][2])  # max_x
-                rect.bottom = math.floor(cell["bbox"][3])  # max_y
-                bbox: PdfRect = page_view.RectToPage(rect)
-                create_cell["bbox"] = [str(bbox.left), str(bbox.bottom), str(bbox.right), str(bbox.top)]
+                left, bottom, right, top = next(page_bboxes)
+                create_cell["bbox"] = [str(left), str(bottom), str(right), str(top)]
 
             cells.append(create_cell)
 
         return cells
 
+    def _device_rects_to_page(self, page_view: PdfPageView, device_rects: np.ndarray) -> np.ndarray:
+        """
+        Vectorized equivalent of page_view.RectToPage for many rects.
+
+        Args:
+            page_view (PdfPageView): The view of the PDF page used for coordinate conversion.
+            device_rects (np.ndarray): Array of shape (N, 4) with [left, top, right, bottom] device rects.
+
+        Returns:
+            Array of shape (N, 4) with [left, bottom, right, top] PDF rects.
+        """
+        # Invert page to device matrix (x' = a*x + c*y + e, y' = b*x + d*y + f)
+        matrix: PdfMatrix = page_view.GetDeviceMatrix()
+        to_page: np.ndarray = np.linalg.inv(
+            np.array([[matrix.a, matrix.c, matrix.e], [matrix.b, matrix.d, matrix.f], [0.0, 0.0, 1.0]])
+        )
+
+        # Transform both corners of each rect and normalize them
+        corners: np.ndarray = device_rects.reshape(-1, 2, 2) @ to_page[:2, :2].T + to_page[:2, 2]
+        min_corner: np.ndarray = corners.min(axis=1)
+        max_corner: np.ndarray = corners.max(axis=1)
+        return np.column_stack((min_corner[:, 0], min_corner[:, 1], max_corner[:, 0], max_corner[:, 1]))
+
     def _convert_bool_to_str(self, value: bool) -> str:
         """
         Create value for json as pdfix template expects
@@ -437,17 +397,17 @@ class TemplateJsonCreator:
         """
         return "true" if value else "false"
 
-    def _is_footer_or_header(self, page_view: PdfPageView, bbox: PdfRect) -> str:
+    def _is_footer_or_header(self, page_view: PdfPageView, top: float) -> str:
         """
         According to Y coordinate of bbox return if it is "header" or "footer"
 
         Args:
             page_view (PdfPageView): Page view to get page heigh
-            bbox (PdfRect): Bounding box in PDF coordinates (Y=0 is bottom)
+            top (float): Top of bounding box in PDF coordinates (Y=0 is bottom)
 
         Returns:
             "header" or "footer"
         """
         page_height: int = page_view.GetDeviceHeight()
         half_height: float = page_height / 2
-        return "footer" if bbox.top < half_height else "header"
+        return "footer" if top < half_height else "header"
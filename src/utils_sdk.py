@@ -1,12 +1,13 @@
 import ctypes
-import json
 import re
 from typing import Optional
 
 from pdfixsdk import (
     PdfDoc,
     Pdfix,
+    PdfPage,
     PdsArray,
+    PdsContent,
     PdsDictionary,
     PdsObject,
     PdsStream,
@@ -39,23 +40,18 @@ def authorize_sdk(pdfix: Pdfix, license_name: Optional[str], license_key: Option
         print("No license name or key provided. Using PDFix SDK trial")
 
 
-def json_to_raw_data(json_dict: dict) -> tuple[ctypes.Array[ctypes.c_ubyte], int]:
+def page_has_content(page: PdfPage) -> bool:
     """
-    Converts a JSON dictionary into a raw byte array (c_ubyte array) that can be used for low-level data operations.
+    Checks if page has any content objects (text, image, path, ...) that could be tagged.
 
-    Parameters:
-        json_dict (dict): A Python dictionary to be converted into JSON format and then into raw bytes.
+    Args:
+        page (PdfPage): The PDF document page.
 
     Returns:
-        tuple: A tuple containing:
-            - json_data_raw (ctypes.c_ubyte array): The raw byte array representation of the JSON data.
-            - json_data_size (int): The size of the JSON data in bytes.
+        True if page content contains at least one object.
     """
-    json_str: str = json.dumps(json_dict)
-    json_data: bytearray = bytearray(json_str.encode("utf-8"))
-    json_data_size: int = len(json_str)
-    json_data_raw: ctypes.Array[ctypes.c_ubyte] = (ctypes.c_ubyte * json_data_size).from_buffer(json_data)
-    return json_data_raw, json_data_size
+    content: Optional[PdsContent] = page.GetContent()
+    return content is not None and content.GetNumObjects() > 0
 
 
 def browse_tags_recursive(element: PdsStructElement, regex_tag: str) -> list[PdsStructElement]:
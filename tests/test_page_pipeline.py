@@ -0,0 +1,79 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Modules in src import each other by plain module names
+sys.path.insert(0, str(Path(__file__).parent.joinpath("../src").resolve()))
+
+from exceptions import (  # noqa: E402
+    PdfixFailedToCreateTemplateException,
+    PdfixFailedToRenderException,
+    PdfixFailedToTagException,
+)
+from page_pipeline import PdfPagesPipeline  # noqa: E402
+
+
+class TestPdfPagesPipeline(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pdfix: mock.MagicMock = mock.MagicMock()
+        self.paddlex: mock.MagicMock = mock.MagicMock()
+        self.paddlex.process_pdf_page_image_with_ai.return_value = {}
+        self.pipeline: PdfPagesPipeline = PdfPagesPipeline(
+            self.pdfix, 2.0, self.paddlex, mock.MagicMock(), PdfixFailedToTagException
+        )
+
+    def _create_doc(self, pages: list[mock.MagicMock]) -> mock.MagicMock:
+        """
+        Create mocked PDF document with given pages.
+
+        Args:
+            pages (list[mock.MagicMock]): Mocked pages returned by AcquirePage.
+
+        Returns:
+            Mocked PDF document.
+        """
+        doc: mock.MagicMock = mock.MagicMock()
+        doc.GetNumPages.return_value = len(pages)
+        doc.AcquirePage.side_effect = pages
+        return doc
+
+    @mock.patch("page_pipeline.page_has_content", return_value=True)
+    @mock.patch("page_pipeline.create_image_from_pdf_page")
+    def test_render_failure_releases_page_and_page_view(
+        self, create_image_mock: mock.MagicMock, _: mock.MagicMock
+    ) -> None:
+        create_image_mock.side_effect = PdfixFailedToRenderException(self.pdfix, "Unable to draw the content")
+        page: mock.MagicMock = mock.MagicMock()
+        doc: mock.MagicMock = self._create_doc([page])
+
+        with self.assertRaises(PdfixFailedToRenderException):
+            self.pipeline.process_pages(doc, "document", mock.MagicMock(), 1.0)
+
+        page.AcquirePageView.return_value.Release.assert_called_once()
+        page.Release.assert_called_once()
+
+    @mock.patch("page_pipeline.page_has_content", return_value=True)
+    @mock.patch("page_pipeline.create_image_from_pdf_page")
+    def test_acquire_page_view_failure_releases_all_pages(self, _: mock.MagicMock, __: mock.MagicMock) -> None:
+        # Autotag and template creation share the pipeline, each with its own failure exception
+        for failure_exception in [PdfixFailedToTagException, PdfixFailedToCreateTemplateException]:
+            with self.subTest(failure_exception=failure_exception.__name__):
+                pipeline: PdfPagesPipeline = PdfPagesPipeline(
+                    self.pdfix, 2.0, self.paddlex, mock.MagicMock(), failure_exception
+                )
+                rendered_page: mock.MagicMock = mock.MagicMock()
+                failed_page: mock.MagicMock = mock.MagicMock()
+                failed_page.AcquirePageView.return_value = None
+                doc: mock.MagicMock = self._create_doc([rendered_page, failed_page])
+
+                with self.assertRaises(failure_exception):
+                    pipeline.process_pages(doc, "document", mock.MagicMock(), 1.0)
+
+                rendered_page.AcquirePageView.return_value.Release.assert_called_once()
+                rendered_page.Release.assert_called_once()
+                failed_page.Release.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()